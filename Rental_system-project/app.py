@@ -1,32 +1,76 @@
 from flask import Flask
 from flask_cors import CORS
-from blueprints.properties.properties import properties_bp 
-from blueprints.users.users import users_bp   
+from werkzeug.middleware.proxy_fix import ProxyFix
+from blueprints.properties.properties import properties_bp
+from blueprints.users.users import users_bp, resume_pending_cascades
 from blueprints.reviews.reviews import reviews_bp
 from blueprints.auth.auth import auth_bp
+from blueprints.searches.searches import searches_bp
 import globals
+import ratelimit
+import compression
+import sync
 import os
 
-app = Flask(__name__)
+# Importing the blueprints is cheap: they have no import-time side effects
+# (no DB connection, no filesystem access)
+BLUEPRINTS = [properties_bp, users_bp, reviews_bp, auth_bp, searches_bp]
 
-# Enable CORS for all routes
-CORS(app)
 
-# Uses SECRET_KEY from globals.py
-app.config['SECRET_KEY'] = globals.SECRET_KEY  
+#Registering Blueprints
+def register_blueprints(app):
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
 
-#Ensure the upload folder exists
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+def create_app(eager_init=None):
+    app = Flask(__name__)
 
-# Registering Blueprints
-app.register_blueprint(properties_bp)  
-app.register_blueprint(users_bp)  
-app.register_blueprint(reviews_bp)
-app.register_blueprint(auth_bp)
+    # Enable CORS for all routes
+    CORS(app)
+
+    # Uses SECRET_KEY from globals.py
+    app.config['SECRET_KEY'] = globals.SECRET_KEY
+    app.config['UPLOAD_FOLDER'] = globals.UPLOAD_FOLDER
+
+    register_blueprints(app)
+
+    # gzip/brotli for large JSON responses
+    compression.init_app(app)
+
+    # Behind a load balancer remote_addr is the proxy's address. Set TRUSTED_PROXIES
+    # to the number of proxies in front of the app to read the client IP from
+    # X-Forwarded-For instead (only enable this when those proxies set the header)
+    trusted_proxies = int(os.environ.get('TRUSTED_PROXIES', 0))
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
+    # Share rate limits between workers through Redis when configured,
+    # otherwise every worker keeps its own in-process buckets
+    redis_url = os.environ.get('RATELIMIT_REDIS_URL')
+    if redis_url:
+        import redis
+        ratelimit.set_store(ratelimit.RedisStore(redis.Redis.from_url(redis_url)))
+
+    # By default the DB connection and filesystem checks are deferred until
+    # first use; set EAGER_INIT=1 to run them before serving traffic
+    if eager_init is None:
+        eager_init = os.environ.get('EAGER_INIT') == '1'
+    if eager_init:
+        globals.init_resources()
+
+    # Keeps in-process caches coherent with writes from other workers.
+    # Started on the first request so it runs in the worker, after any fork
+    if os.environ.get('SYNC_WORKER', '1') == '1':
+        app.before_request(sync.start)
+
+    # Finishes user deletions whose background cleanup was interrupted
+    app.before_request(resume_pending_cascades)
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)  
+    app.run(debug=True, port=5001)
@@ -0,0 +1,88 @@
+"""Compares CPU time against bytes saved for gzip and brotli on listing responses.
+
+Builds property listing JSON shaped like GET /properties and reports, for
+each encoder setting, the compressed size and the time to compress. It also
+times a hit on the compressed-body cache. No MongoDB is needed.
+
+Usage (from the Rental_system-project folder):
+    python benchmarks/compression_benchmark.py --page-size 50
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compression
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+LOCATIONS = ['Leeds', 'Manchester', 'London', 'Bristol', 'Coventry', 'Birmingham']
+
+
+def listing_body(page_size):
+    items = []
+    for i in range(page_size):
+        items.append({
+            "_id": "%024x" % random.getrandbits(96),
+            "owner_name": f"owner{i % 7}",
+            "property_type": random.choice(['flat', 'house', 'studio']),
+            "rental_price": random.randint(400, 2500),
+            "bedrooms": random.randint(1, 5),
+            "bathrooms": random.randint(1, 3),
+            "availability_status": "available",
+            "views": random.randint(0, 500),
+            "location_name": random.choice(LOCATIONS),
+            "latitude": round(random.uniform(50, 55), 6),
+            "longitude": round(random.uniform(-3, 0), 6),
+            "reviews": [{"_id": "%024x" % random.getrandbits(96), "user": "tenant", "rating": 4,
+                         "comment": "Nice place, close to the station."}] * random.randint(0, 3),
+        })
+    return json.dumps({"items": items, "total": 1000, "page": 1, "page_size": page_size, "has_more": True}).encode()
+
+
+#Returns microseconds per call
+def time_calls(func, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    body = listing_body(args.page_size)
+    print(f"uncompressed body: {len(body)} bytes")
+
+    encoders = [(f"gzip -{level}", lambda level=level: gzip.compress(body, compresslevel=level)) for level in (1, 6, 9)]
+    if brotli:
+        encoders += [(f"brotli q{quality}", lambda quality=quality: brotli.compress(body, quality=quality)) for quality in (1, 5, 9, 11)]
+    else:
+        print("brotli is not installed, skipping it")
+
+    for name, encode in encoders:
+        size = len(encode())
+        repeat = max(args.repeat // 20, 1) if 'q11' in name else args.repeat
+        print(f"{name:10s} {size:8d} bytes  ratio {len(body) / size:5.2f}  {time_calls(encode, repeat):9.1f} us")
+
+    encoding = compression.supported_encodings()[0]
+    key = (hashlib.sha1(body).hexdigest(), encoding)
+    compression.compressed_bodies.set(key, compression.compress(body, encoding))
+    cache_hit = time_calls(lambda: compression.compressed_bodies.get((hashlib.sha1(body).hexdigest(), encoding)), args.repeat)
+    print(f"cached {encoding} hit (sha1 + lookup): {cache_hit:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
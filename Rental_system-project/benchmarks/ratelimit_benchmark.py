@@ -0,0 +1,66 @@
+"""Measures the per-request overhead of the rate limiter.
+
+Compares the bare token-bucket check and a full test-client request to a
+route with and without @rate_limited. No MongoDB is needed.
+
+Usage (from the Rental_system-project folder):
+    python benchmarks/ratelimit_benchmark.py --requests 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+import ratelimit
+from ratelimit import rate_limited, MemoryStore, Policy
+
+# Large enough that no request in the benchmark is rejected
+ratelimit.POLICIES['benchmark'] = Policy(capacity=10 ** 9, refill_rate=10 ** 9)
+
+
+def build_app():
+    app = Flask(__name__)
+
+    @app.route('/plain')
+    def plain():
+        return jsonify({'ok': True})
+
+    @app.route('/limited')
+    @rate_limited('benchmark')
+    def limited():
+        return jsonify({'ok': True})
+
+    return app
+
+
+#Returns microseconds per call
+def time_calls(func, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    store = MemoryStore()
+    policy = ratelimit.POLICIES['benchmark']
+    bucket_check = time_calls(lambda: store.take('ip:127.0.0.1', policy), args.requests)
+
+    client = build_app().test_client()
+    plain = time_calls(lambda: client.get('/plain'), args.requests)
+    limited = time_calls(lambda: client.get('/limited'), args.requests)
+
+    print(f"token bucket check:     {bucket_check:8.2f} us")
+    print(f"request without limit:  {plain:8.2f} us")
+    print(f"request with limit:     {limited:8.2f} us  (+{limited - plain:.2f} us)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Measures time-to-first-response for freshly started workers.
+
+Each worker is a new Python process that imports the app and serves two
+requests through the test client:
+  - one to a route that does not need MongoDB (startup cost only)
+  - then one that reads from MongoDB, which with lazy init also pays for
+    creating the MongoClient and connecting
+
+Usage (from the Rental_system-project folder, needs MongoDB unless --skip-db):
+    python benchmarks/startup_benchmark.py --workers 10
+    python benchmarks/startup_benchmark.py --workers 10 --eager
+    python benchmarks/startup_benchmark.py --workers 10 --skip-db
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER_CODE = """
+import sys
+import time
+from app import app
+client = app.test_client()
+client.get('/properties/not-an-id')
+print(time.time())
+if sys.argv[1] == 'db':
+    response = client.get('/properties?page_size=1')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    print(time.time())
+"""
+
+
+#Starts one worker and returns the seconds until its first response and its first DB-backed response
+def time_worker(eager, with_db):
+    env = dict(os.environ, EAGER_INIT='1' if eager else '0', SYNC_WORKER='0')
+    started = time.time()
+    output = subprocess.run(
+        [sys.executable, '-c', WORKER_CODE, 'db' if with_db else 'no-db'],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return [float(timestamp) - started for timestamp in output]
+
+
+def report(label, timings):
+    print(f"{label:<28} min {min(timings) * 1000:.1f} ms  "
+          f"median {statistics.median(timings) * 1000:.1f} ms  max {max(timings) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--eager', action='store_true', help='run the init hook (DB ping, indexes, upload folder) at startup')
+    parser.add_argument('--skip-db', action='store_true', help='only time the request that does not need MongoDB')
+    args = parser.parse_args()
+
+    runs = [time_worker(args.eager, not args.skip_db) for _ in range(args.workers)]
+
+    print(f"workers: {args.workers} ({'eager' if args.eager else 'lazy'} init)")
+    report("time-to-first-response", [run[0] for run in runs])
+    if not args.skip_db:
+        report("time-to-first-DB-response", [run[1] for run in runs])
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ import datetime
 import bcrypt
 import globals
 from decorators import jwt_required
+from ratelimit import rate_limited
 
 auth_bp = Blueprint('auth_bp', __name__)
 
@@ -12,6 +13,7 @@ users = globals.db.users
 
 #Login endpoint
 @auth_bp.route('/login', methods=['POST'])
+@rate_limited('auth')
 def login():
     try:
         auth = request.json  
@@ -29,7 +31,7 @@ def login():
                     'user_id': str(user['_id']),
                     'username': user['username'],
                     'role': user.get('role', 'tenant'),  # Default to tenant if role is missing
-                    'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+                    'exp': datetime.datetime.utcnow() + globals.TOKEN_LIFETIME
                 }, globals.SECRET_KEY, algorithm='HS256')
 
                 return make_response(jsonify({'token': token}), 200)
@@ -56,7 +58,7 @@ def logout():
             return make_response(jsonify({'error': 'Token already blacklisted'}), 400)
 
         # Inserting into blacklist
-        blacklist.insert_one({'token': token})
+        blacklist.insert_one({'token': token, 'user_id': request.user['user_id'], 'updated_at': datetime.datetime.utcnow()})
         return make_response(jsonify({'message': 'Successfully logged out'}), 200)
 
     except Exception as e:
@@ -1,7 +1,16 @@
 from flask import Blueprint, request, jsonify, make_response
 from decorators import jwt_required, owner_required, admin_required, tenant_required
+from ratelimit import rate_limited
+from cache import TTLCache
+from blueprints.searches.matching import parse_search_params, record_matches
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+import cache
+import sync
 import globals
+import datetime
+import json
 import os
 from werkzeug.utils import secure_filename
 
@@ -10,11 +19,11 @@ properties_bp = Blueprint('properties_bp', __name__)
 properties = globals.db.properties  #mongoDB properties collection
 users = globals.db.users  # MongoDB Users Collection
 
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+MAX_PAGE_SIZE = 100
 
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+search_counts = TTLCache(ttl=30, maxsize=2048)  # normalised search filter -> count_documents result
+cache.subscribe('properties', lambda property_id: search_counts.clear())
 
 
 # Checks if the file extension is allowed
@@ -22,37 +31,130 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+#Helper function to convert a property document into a JSON friendly dict
+def serialize_property(property):
+    property['_id'] = str(property['_id'])  # Convert ObjectId to String
+    property['views'] = property.get('views', 0)
+
+    # Include location details in response
+    if "location" in property:
+        property['location_name'] = property['location'].get('name', 'Unknown')  # Ensure location name exists
+        property['latitude'] = property['location']['coordinates'][1]
+        property['longitude'] = property['location']['coordinates'][0]
+        del property['location']  # Remove raw GeoJSON format
+
+    # Converts nested ObjectId fields inside reviews
+    if "reviews" in property:
+        for review in property["reviews"]:
+            review["_id"] = str(review["_id"])  # Convert Review ObjectId to String
+            review["user_id"] = str(review["user_id"])  # Convert user_id to string
+
+    return property
+
+
+#Helper function to build a filter that only matches properties the current user may change
+def owned_property_filter(property_oid):
+    if request.user.get('role') == 'admin':
+        return {"_id": property_oid}
+    return {"_id": property_oid, "owner_id": request.user.get('user_id')}
+
+
+#Helper function to explain why an ownership-filtered write matched nothing (only runs on failure)
+def ownership_error(property_oid, message):
+    if not properties.find_one({"_id": property_oid}, {"_id": 1}):
+        return make_response(jsonify({"error": "Property not found"}), 404)
+    return make_response(jsonify({"error": message}), 403)
+
+
+#Helper function to read page and page_size from the query string.
+#Clamped so a negative page_size cannot become .limit(0) (no limit) or a negative skip
+def get_page_args():
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        page_size = max(1, min(int(request.args.get('page_size', 10)), MAX_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("page and page_size must be integers")
+    return page, page_size, (page - 1) * page_size
+
+
+def page_args_error(error):
+    return make_response(jsonify({"error": str(error)}), 400)
+
+
+#Helper function to build the pagination envelope from a page fetched with limit+1
+def paginated_response(documents, page, page_size, total):
+    has_more = len(documents) > page_size
+    return make_response(jsonify({
+        "items": [serialize_property(property) for property in documents[:page_size]],
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "has_more": has_more
+    }), 200)
+
+
+#Helper function to turn the search query string into a MongoDB filter
+def build_search_query(args):
+    params = parse_search_params(args)
+    query = {}
+
+    if 'location' in params:
+        query['location.name'] = {'$regex': params['location'], '$options': 'i'}
+
+    if 'min_price' in params:
+        query['rental_price'] = {
+            "$gte": params['min_price'],
+            "$lte": params['max_price']
+        }
+
+    for field in ('bedrooms', 'bathrooms', 'availability_status'):
+        if field in params:
+            query[field] = params[field]
+
+    return query
+
+
+#Helper function to count search matches, cached briefly per normalised filter.
+#The location regex stays as typed: lower-casing it would also change escapes like \D or \S
+def count_search_results(query):
+    key = json.dumps(query, sort_keys=True)
+    return search_counts.get_or_set(key, lambda: properties.count_documents(query))
+
+
 #To get all properties with pagination
 @properties_bp.route('/properties', methods=['GET'])
 def get_all_properties():
     try:
-        page = int(request.args.get('page', 1))  
-        page_size = int(request.args.get('page_size', 10))  
-        skip = (page - 1) * page_size  
+        try:
+            page, page_size, skip = get_page_args()
+        except ValueError as e:
+            return page_args_error(e)
+
+        # Fetch one extra document to know whether another page exists
+        documents = list(properties.find().skip(skip).limit(page_size + 1))
 
-        properties_cursor = properties.find().skip(skip).limit(page_size)
-        data_to_return = []
+        return paginated_response(documents, page, page_size, properties.estimated_document_count())
 
-        for property in properties_cursor:
-            property['_id'] = str(property['_id'])  # Convert ObjectId to String
-            property['views'] = property.get('views', 0)
+    except Exception as e:
+        return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
 
-            # Include location details in response
-            if "location" in property:
-                property['location_name'] = property['location'].get('name', 'Unknown') 
-                property['latitude'] = property['location']['coordinates'][1]
-                property['longitude'] = property['location']['coordinates'][0]
-                del property['location']  
 
-            # Converts nested ObjectId fields inside reviews
-            if "reviews" in property:
-                for review in property["reviews"]:
-                    review["_id"] = str(review["_id"])  # Convert Review ObjectId to String
-                    review["user_id"] = str(review["user_id"])  # Convert user_id to string
+#To get the properties owned by the logged in user
+@properties_bp.route('/properties/mine', methods=['GET'])
+@owner_required
+def get_my_properties():
+    try:
+        query = {"owner_id": request.user['user_id']}
+        try:
+            page, page_size, skip = get_page_args()
+        except ValueError as e:
+            return page_args_error(e)
 
-            data_to_return.append(property)
+        # Fetch one extra document to know whether another page exists
+        documents = list(properties.find(query).skip(skip).limit(page_size + 1))
 
-        return make_response(jsonify(data_to_return), 200)
+        # Counting one owner's properties is served by the owner_id index
+        return paginated_response(documents, page, page_size, properties.count_documents(query))
 
     except Exception as e:
         return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
@@ -65,12 +167,13 @@ def create_property():
     try:
         data = request.json
 
-        required_fields = ["owner_name", "property_type", "rental_price", "bedrooms", "bathrooms", "latitude", "longitude", "location_name"]
+        required_fields = ["property_type", "rental_price", "bedrooms", "bathrooms", "latitude", "longitude", "location_name"]
         if not all(field in data for field in required_fields):
             return make_response(jsonify({'error': 'Missing required fields'}), 400)
 
         property_data = {
-            "owner_name": data.get("owner_name"),
+            "owner_id": request.user['user_id'],  # Owner taken from the token
+            "owner_name": data.get("owner_name", request.user['username']),
             "property_type": data.get("property_type"),
             "location": {
                 "name": data.get("location_name"),  # Stores location name 
@@ -81,10 +184,15 @@ def create_property():
             "bedrooms": data.get("bedrooms"),
             "bathrooms": data.get("bathrooms"),
             "availability_status": data.get("availability_status", "available"),
-            "views": 0  
+            "views": 0,
+            "updated_at": datetime.datetime.utcnow()
         }
 
         result = properties.insert_one(property_data)
+
+        # Alert tenants whose saved searches this new listing matches
+        record_matches(property_data)
+
         return make_response(jsonify({"message": "Property added successfully", "property_id": str(result.inserted_id)}), 201)
 
     except Exception as e:
@@ -103,14 +211,23 @@ def upload_property_image(property_id):
         return jsonify({"error": "No selected file"}), 400
 
     if file and allowed_file(file.filename):
+        try:
+            property_oid = ObjectId(property_id)
+        except InvalidId:
+            return jsonify({"error": "Invalid property ID format"}), 400
+
         filename = secure_filename(file.filename)
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
 
-        properties.update_one(
-            {"_id": ObjectId(property_id)},
-            {"$set": {"image_url": f"/uploads/{filename}"}}
+        # Owners can only change their own properties, admins any
+        result = properties.update_one(
+            owned_property_filter(property_oid),
+            {"$set": {"image_url": f"/uploads/{filename}", "updated_at": datetime.datetime.utcnow()}}
         )
+        if result.matched_count == 0:
+            return ownership_error(property_oid, "Unauthorized: You can only update your own properties")
+
+        file_path = os.path.join(globals.ensure_upload_folder(), filename)
+        file.save(file_path)
 
         return jsonify({"message": "Image uploaded successfully", "image_url": f"/uploads/{filename}"}), 201
 
@@ -118,55 +235,19 @@ def upload_property_image(property_id):
 
 #Searching properties with filters
 @properties_bp.route('/properties/search', methods=['GET'])
+@rate_limited('properties.search')
 def search_properties():
     try:
-        query = {}
-
-        if 'location' in request.args:
-            query['location.name'] = {'$regex': request.args['location'], '$options': 'i'}
-        
-        if 'min_price' in request.args and 'max_price' in request.args:
-            query['rental_price'] = {
-                "$gte": float(request.args['min_price']),
-                "$lte": float(request.args['max_price'])
-            }
-
-        if 'bedrooms' in request.args:
-            query['bedrooms'] = int(request.args['bedrooms'])
-
-        if 'bathrooms' in request.args:
-            query['bathrooms'] = int(request.args['bathrooms'])
-
-        if 'availability_status' in request.args:
-            query['availability_status'] = request.args['availability_status']
-
-        page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 10))
-        skip = (page - 1) * page_size
-
-        properties_cursor = properties.find(query).skip(skip).limit(page_size).sort("rental_price", 1)
-        data_to_return = []
-
-        for property in properties_cursor:
-            property['_id'] = str(property['_id'])  # Convert ObjectId to string
-            property['views'] = property.get('views', 0)
-
-            # Convert ObjectId inside reviews
-            if "reviews" in property:
-                for review in property["reviews"]:
-                    review["_id"] = str(review["_id"])
-                    review["user_id"] = str(review["user_id"])
-
-            # Include location details in response
-            if "location" in property:
-                property["location_name"] = property["location"].get("name", "Unknown")  # Ensure location name exists
-                property["latitude"] = property["location"]["coordinates"][1]
-                property["longitude"] = property["location"]["coordinates"][0]
-                del property["location"]  # Remove raw GeoJSON format
+        query = build_search_query(request.args)
+        try:
+            page, page_size, skip = get_page_args()
+        except ValueError as e:
+            return page_args_error(e)
 
-            data_to_return.append(property)
+        # Fetch one extra document to know whether another page exists
+        documents = list(properties.find(query).skip(skip).limit(page_size + 1).sort("rental_price", 1))
 
-        return make_response(jsonify(data_to_return), 200)
+        return paginated_response(documents, page, page_size, count_search_results(query))
 
     except Exception as e:
         return make_response(jsonify({"error": "Invalid request", "details": str(e)}), 400)
@@ -198,10 +279,19 @@ def update_property(property_id):
         if not update_fields:
             return make_response(jsonify({'error': 'No valid fields to update'}), 400)
 
-        result = properties.update_one({"_id": ObjectId(property_id)}, {"$set": update_fields})
+        update_fields["updated_at"] = datetime.datetime.utcnow()
+
+        # Owners can only update their own properties, admins any
+        property_oid = ObjectId(property_id)
+        updated_property = properties.find_one_and_update(
+            owned_property_filter(property_oid), {"$set": update_fields}, return_document=ReturnDocument.AFTER
+        )
+
+        if updated_property is None:
+            return ownership_error(property_oid, "Unauthorized: You can only update your own properties")
 
-        if result.modified_count == 0:
-            return make_response(jsonify({"message": "No changes made or property not found"}), 404)
+        # The update may make the property match saved searches it did not match before
+        record_matches(updated_property)
 
         return make_response(jsonify({"message": "Property updated successfully"}), 200)
 
@@ -211,6 +301,7 @@ def update_property(property_id):
 
 #Getting a single property with the property_id
 @properties_bp.route('/properties/<string:property_id>', methods=['GET'])
+@rate_limited('properties.view')
 def get_property(property_id):
     try:
         # Convert property_id to ObjectId
@@ -226,24 +317,9 @@ def get_property(property_id):
         # Increment views count
         properties.update_one({"_id": property_oid}, {"$inc": {"views": 1}})
 
-        # Convert ObjectId to String
-        property["_id"] = str(property["_id"])
         property["views"] = property.get("views", 0) + 1
 
-        # Convert nested ObjectId fields inside reviews
-        if "reviews" in property:
-            for review in property["reviews"]:
-                review["_id"] = str(review["_id"])  # Convert Review ID
-                review["user_id"] = str(review["user_id"])  # Convert User ID
-
-        # Include location details in response
-        if "location" in property:
-            property["location_name"] = property["location"].get("name", "Unknown")  # Ensure location name exists
-            property["latitude"] = property["location"]["coordinates"][1]
-            property["longitude"] = property["location"]["coordinates"][0]
-            del property["location"]  # Remove raw GeoJSON format
-
-        return make_response(jsonify(property), 200)
+        return make_response(jsonify(serialize_property(property)), 200)
 
     except Exception as e:
         return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
@@ -253,13 +329,8 @@ def get_property(property_id):
 @jwt_required  # Ensure user is logged in
 def delete_property(property_id):
     try:
-        # Debugging: Print user data from token
-        print("Decoded JWT User Data:", request.user)
-
-        # Extract user role and ID from token
+        # Extract user role from token
         user_role = request.user.get('role')
-        user_id = request.user.get('user_id')
-        user_name = request.user.get('username')
 
         # Convert property_id to ObjectId
         try:
@@ -267,33 +338,20 @@ def delete_property(property_id):
         except:
             return make_response(jsonify({"error": "Invalid property ID format"}), 400)
 
-        # Find the property
-        property = properties.find_one({"_id": property_oid})
-        if not property:
-            return make_response(jsonify({"error": "Property not found"}), 404)
-
-        # Debugging: Print the property details
-        print("Property Data:", property)
-
-        # Admins can delete any property
-        if user_role == "admin":
-            properties.delete_one({"_id": property_oid})
-            return make_response(jsonify({"message": "Property deleted successfully by Admin"}), 200)
+        if user_role not in ("admin", "owner"):
+            return make_response(jsonify({"error": "Unauthorized: You can only delete your own properties"}), 403)
 
-        # Owners can only delete their own properties
-        if user_role == "owner":
-            stored_owner_name = property.get("owner_name", "").strip().lower()  # Convert to lowercase
-            user_name_check = user_name.strip().lower()  # Convert to lowercase
+        # Admins can delete any property, owners only their own
+        result = properties.delete_one(owned_property_filter(property_oid))
 
-            print(f"Stored Owner Name: {stored_owner_name}, Requesting User: {user_name_check}")
+        if result.deleted_count == 0:
+            return ownership_error(property_oid, "Unauthorized: You can only delete your own properties")
 
-            if stored_owner_name == user_name_check:
-                properties.delete_one({"_id": property_oid})
-                return make_response(jsonify({"message": "Property deleted successfully by Owner"}), 200)
-            else:
-                return make_response(jsonify({"error": "Unauthorized: You can only delete your own properties"}), 403)
+        sync.record_deletions('properties', [property_oid])
 
-        return make_response(jsonify({"error": "Unauthorized: You can only delete your own properties"}), 403)
+        if user_role == "admin":
+            return make_response(jsonify({"message": "Property deleted successfully by Admin"}), 200)
+        return make_response(jsonify({"message": "Property deleted successfully by Owner"}), 200)
 
     except Exception as e:
         return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
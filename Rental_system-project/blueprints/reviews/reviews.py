@@ -204,14 +204,14 @@ def recalculate_average_rating(property_id):
         property = properties.find_one({"_id": ObjectId(property_id)}, {"reviews": 1})
 
         if not property or "reviews" not in property or not property["reviews"]:
-            properties.update_one({"_id": ObjectId(property_id)}, {"$set": {"average_rating": 0}})
+            properties.update_one({"_id": ObjectId(property_id)}, {"$set": {"average_rating": 0, "updated_at": datetime.datetime.utcnow()}})
             return
 
         total_rating = sum(review["rating"] for review in property["reviews"])
         review_count = len(property["reviews"])
         average_rating = round(total_rating / review_count, 1)  # Round to 1 decimal place
 
-        properties.update_one({"_id": ObjectId(property_id)}, {"$set": {"average_rating": average_rating}})
+        properties.update_one({"_id": ObjectId(property_id)}, {"$set": {"average_rating": average_rating, "updated_at": datetime.datetime.utcnow()}})
 
     except Exception as e:
         print(f"Error recalculating average rating: {e}")
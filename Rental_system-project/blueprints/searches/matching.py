@@ -0,0 +1,244 @@
+from pymongo import UpdateOne
+import datetime
+import threading
+import math
+import re
+import globals
+import cache
+
+saved_searches = globals.db.saved_searches  # MongoDB saved searches collection
+search_matches = globals.db.search_matches  # Per-user feed of matching properties
+
+PRICE_BUCKET = 250  # width of the finest price bucket
+LEVEL_FACTOR = 8  # each level's buckets are this many times wider than the previous
+MAX_BUCKETS = 8  # a price interval is stored on the finest level where it spans at most this many buckets
+MAX_LEVEL = 12
+
+
+#Helper function to read a value as a number, None when it is missing or not numeric
+def to_number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+#Reads the filters /properties/search accepts (query string or JSON body) into typed values
+def parse_search_params(args):
+    params = {}
+
+    if 'location' in args:
+        params['location'] = args['location']
+
+    if 'min_price' in args and 'max_price' in args:
+        params['min_price'] = float(args['min_price'])
+        params['max_price'] = float(args['max_price'])
+
+    if 'bedrooms' in args:
+        params['bedrooms'] = int(args['bedrooms'])
+
+    if 'bathrooms' in args:
+        params['bathrooms'] = int(args['bathrooms'])
+
+    if 'availability_status' in args:
+        params['availability_status'] = args['availability_status']
+
+    return params
+
+
+#Rejects saved searches that could never match or that the index cannot hold
+def validate_search_params(params):
+    if 'min_price' in params:
+        if not (math.isfinite(params['min_price']) and math.isfinite(params['max_price'])):
+            raise ValueError("Prices must be finite numbers")
+        if params['min_price'] > params['max_price']:
+            raise ValueError("min_price must not be greater than max_price")
+
+    if 'location' in params:
+        if not isinstance(params['location'], str):
+            raise ValueError("location must be a string")
+        try:
+            re.compile(params['location'])
+        except re.error:
+            raise ValueError("location is not a valid pattern")
+
+    if 'availability_status' in params and not isinstance(params['availability_status'], str):
+        raise ValueError("availability_status must be a string")
+
+
+#Checks the filters that are not part of the index
+def search_matches_property(params, property):
+    price = to_number(property.get('rental_price'))
+    if 'min_price' in params:
+        if price is None or not (params['min_price'] <= price <= params['max_price']):
+            return False
+
+    if 'bedrooms' in params and to_number(property.get('bedrooms'), int) != params['bedrooms']:
+        return False
+
+    if 'bathrooms' in params and to_number(property.get('bathrooms'), int) != params['bathrooms']:
+        return False
+
+    if 'availability_status' in params and property.get('availability_status') != params['availability_status']:
+        return False
+
+    if 'location' in params:
+        location_name = property.get('location', {}).get('name', '')
+        try:
+            if not re.search(params['location'], location_name, re.IGNORECASE):
+                return False
+        except re.error:
+            return False
+
+    return True
+
+
+#In-process index of saved searches.
+#Searches are grouped by (bedrooms, bathrooms) with None meaning "any", then by price
+#bucket on a multi-level grid, so a new property only looks at the buckets its price falls in
+class SearchIndex:
+    def __init__(self):
+        self.searches = {}  # search_id -> (user_id, params, [(group_key, slot)])
+        self.groups = {}  # (bedrooms, bathrooms) -> {'any_price': set(), (level, bucket): set()}
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def price_slots(self, params):
+        if 'min_price' not in params:
+            return ['any_price']
+
+        low, high = params['min_price'], params['max_price']
+        if high < low:
+            return []
+
+        for level in range(MAX_LEVEL + 1):
+            width = PRICE_BUCKET * LEVEL_FACTOR ** level
+            first, last = int(low // width), int(high // width)
+            if last - first < MAX_BUCKETS:
+                return [(level, bucket) for bucket in range(first, last + 1)]
+
+        return ['any_price']  # wider than the coarsest level, checked exactly on match
+
+    def add(self, search_id, user_id, params):
+        with self.lock:
+            self.remove(search_id)
+
+            group_key = (params.get('bedrooms'), params.get('bathrooms'))
+            group = self.groups.setdefault(group_key, {})
+            slots = []
+            for slot in self.price_slots(params):
+                group.setdefault(slot, set()).add(search_id)
+                slots.append((group_key, slot))
+
+            self.searches[search_id] = (user_id, params, slots)
+
+    def remove(self, search_id):
+        with self.lock:
+            entry = self.searches.pop(search_id, None)
+            if entry is None:
+                return
+
+            for group_key, slot in entry[2]:
+                group = self.groups[group_key]
+                group[slot].discard(search_id)
+                if not group[slot]:
+                    del group[slot]
+                if not group:
+                    del self.groups[group_key]
+
+    def match(self, property):
+        """Returns [(search_id, user_id)] for the saved searches this property satisfies."""
+        price = to_number(property.get('rental_price'))
+        bedrooms = to_number(property.get('bedrooms'), int)
+        bathrooms = to_number(property.get('bathrooms'), int)
+
+        with self.lock:
+            candidates = set()
+            for group_key in {(bedrooms, bathrooms), (bedrooms, None), (None, bathrooms), (None, None)}:
+                group = self.groups.get(group_key)
+                if not group:
+                    continue
+
+                candidates |= group.get('any_price', set())
+                if price is not None:
+                    for level in range(MAX_LEVEL + 1):
+                        width = PRICE_BUCKET * LEVEL_FACTOR ** level
+                        candidates |= group.get((level, int(price // width)), set())
+
+            matches = []
+            for search_id in candidates:
+                user_id, params, _ = self.searches[search_id]
+                try:
+                    if search_matches_property(params, property):
+                        matches.append((search_id, user_id))
+                except Exception as e:  # one bad saved search must not hide the others
+                    print(f"Error matching saved search {search_id}: {e}")
+            return matches
+
+    def load(self):
+        """Builds the index from the database the first time it is needed in this worker."""
+        with self.lock:
+            if self.loaded:
+                return
+            self.rebuild()
+
+    def rebuild(self):
+        with self.lock:
+            self.searches, self.groups = {}, {}
+            for search in saved_searches.find({}, {'user_id': 1, 'params': 1}):
+                try:
+                    self.add(search['_id'], search['user_id'], search['params'])
+                except Exception as e:  # skip rows saved before validation existed
+                    print(f"Skipping invalid saved search {search['_id']}: {e}")
+            self.loaded = True
+
+    def refresh(self, search_id):
+        """Reloads one saved search after it changed in the database (None reloads everything)."""
+        if not self.loaded:
+            return
+        if search_id is None:
+            self.rebuild()
+            return
+
+        search = saved_searches.find_one({'_id': search_id}, {'user_id': 1, 'params': 1})
+        if search:
+            self.add(search['_id'], search['user_id'], search['params'])
+        else:
+            self.remove(search_id)
+
+
+search_index = SearchIndex()
+cache.subscribe('saved_searches', search_index.refresh)
+
+
+#Records a property in the feed of every user whose saved search it matches
+def record_matches(property):
+    try:
+        search_index.load()
+        matches = search_index.match(property)
+        if not matches:
+            return
+
+        # This worker's index can lag behind a delete, so only record searches that still exist
+        existing = {search['_id'] for search in
+                    saved_searches.find({'_id': {'$in': [search_id for search_id, _ in matches]}}, {'_id': 1})}
+        for search_id, _ in matches:
+            if search_id not in existing:
+                search_index.remove(search_id)
+
+        matches = [(search_id, user_id) for search_id, user_id in matches if search_id in existing]
+        if not matches:
+            return
+
+        now = datetime.datetime.utcnow()
+        search_matches.bulk_write([
+            UpdateOne(
+                {'search_id': search_id, 'property_id': property['_id']},
+                {'$setOnInsert': {'user_id': user_id, 'created_at': now}},
+                upsert=True
+            )
+            for search_id, user_id in matches
+        ], ordered=False)
+
+    except Exception as e:
+        print(f"Error matching saved searches: {e}")
@@ -0,0 +1,136 @@
+from flask import Blueprint, request, jsonify, make_response
+from decorators import jwt_required
+from bson import ObjectId
+from bson.errors import InvalidId
+import datetime
+import globals
+import sync
+from blueprints.searches.matching import saved_searches, search_matches, search_index, parse_search_params, validate_search_params
+from blueprints.properties.properties import serialize_property, get_page_args, page_args_error
+
+searches_bp = Blueprint('searches_bp', __name__)
+
+properties = globals.db.properties  # MongoDB properties collection
+
+MAX_SAVED_SEARCHES = 20  # per user
+
+
+#Helper function to convert a saved search document into a JSON friendly dict
+def serialize_search(search):
+    search['_id'] = str(search['_id'])
+    return search
+
+
+#Save a search to be alerted about new listings that match it
+@searches_bp.route('/searches', methods=['POST'])
+@jwt_required
+def create_saved_search():
+    try:
+        data = request.json or {}
+
+        try:
+            params = parse_search_params(data)
+        except (TypeError, ValueError):
+            return make_response(jsonify({"error": "Invalid search parameters"}), 400)
+
+        try:
+            validate_search_params(params)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+
+        if not params:
+            return make_response(jsonify({"error": "At least one search filter is required"}), 400)
+
+        user_id = request.user['user_id']
+        if saved_searches.count_documents({"user_id": user_id}) >= MAX_SAVED_SEARCHES:
+            return make_response(jsonify({"error": f"You can save at most {MAX_SAVED_SEARCHES} searches"}), 400)
+
+        now = datetime.datetime.utcnow()
+        search = {"user_id": user_id, "params": params, "created_at": now, "updated_at": now}
+        result = saved_searches.insert_one(search)
+
+        # Other workers pick this up through the sync worker
+        search_index.refresh(result.inserted_id)
+
+        return make_response(jsonify({"message": "Search saved successfully", "search_id": str(result.inserted_id)}), 201)
+
+    except Exception as e:
+        return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
+
+
+#List the logged in user's saved searches
+@searches_bp.route('/searches', methods=['GET'])
+@jwt_required
+def get_saved_searches():
+    try:
+        searches = saved_searches.find({"user_id": request.user['user_id']}).sort("created_at", -1)
+        return make_response(jsonify([serialize_search(search) for search in searches]), 200)
+
+    except Exception as e:
+        return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
+
+
+#Delete a saved search and the feed entries it produced
+@searches_bp.route('/searches/<string:search_id>', methods=['DELETE'])
+@jwt_required
+def delete_saved_search(search_id):
+    try:
+        try:
+            search_oid = ObjectId(search_id)
+        except InvalidId:
+            return make_response(jsonify({"error": "Invalid search ID format"}), 400)
+
+        result = saved_searches.delete_one({"_id": search_oid, "user_id": request.user['user_id']})
+        if result.deleted_count == 0:
+            return make_response(jsonify({"error": "Saved search not found"}), 404)
+
+        search_index.refresh(search_oid)
+        sync.record_deletions('saved_searches', [search_oid])
+        search_matches.delete_many({"search_id": search_oid})
+
+        return make_response(jsonify({"message": "Saved search deleted successfully"}), 200)
+
+    except Exception as e:
+        return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
+
+
+#New listings matching the logged in user's saved searches, newest first
+@searches_bp.route('/searches/feed', methods=['GET'])
+@jwt_required
+def get_search_feed():
+    try:
+        try:
+            page, page_size, skip = get_page_args()
+        except ValueError as e:
+            return page_args_error(e)
+
+        # Only entries of searches the user still has: a worker that had not seen a
+        # delete yet may have recorded matches for it afterwards
+        user_id = request.user['user_id']
+        search_ids = [search["_id"] for search in saved_searches.find({"user_id": user_id}, {"_id": 1})]
+
+        # Fetch one extra entry to know whether another page exists
+        matches = list(search_matches.find({"user_id": user_id, "search_id": {"$in": search_ids}})
+                       .sort("created_at", -1).skip(skip).limit(page_size + 1))
+        has_more = len(matches) > page_size
+        matches = matches[:page_size]
+
+        # Load the matched properties in one query
+        property_ids = list({match["property_id"] for match in matches})
+        found = {property["_id"]: property for property in properties.find({"_id": {"$in": property_ids}})}
+
+        items = []
+        for match in matches:
+            property = found.get(match["property_id"])
+            if property is None:  # property was deleted since it matched
+                continue
+            items.append({
+                "search_id": str(match["search_id"]),
+                "matched_at": match["created_at"],
+                "property": serialize_property(property)
+            })
+
+        return make_response(jsonify({"items": items, "page": page, "page_size": page_size, "has_more": has_more}), 200)
+
+    except Exception as e:
+        return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
@@ -1,20 +1,38 @@
 from flask import Blueprint, request, jsonify, make_response
 from decorators import jwt_required, admin_required
+from ratelimit import rate_limited
 from bson import ObjectId
+from pymongo import UpdateOne, DeleteOne
 import jwt
 import bcrypt
 import datetime
+import threading
+import time
+import re
 import globals
+import sync
 from bson.errors import InvalidId
 
 users_bp = Blueprint('users_bp', __name__)
 
 users = globals.db.users  # MongoDB Users Collection
 blacklist = globals.db.blacklist  # Token blacklist collection
+properties = globals.db.properties  # Reviews are embedded in properties
+saved_searches = globals.db.saved_searches
+search_matches = globals.db.search_matches
+pending_deletions = globals.db.pending_deletions  # user cleanups not finished yet
+
+ROLES = ["admin", "owner", "tenant"]
+MAX_BATCH_SIZE = 500  # ids per batch request
+CASCADE_BATCH_SIZE = 100  # properties cleaned per background round trip
+CASCADE_PAUSE = 0.05  # seconds between background batches
+CASCADE_LEASE = datetime.timedelta(minutes=5)  # a cascade not renewed within this is picked up again
+CASCADE_SWEEP_INTERVAL = 60  # seconds between checks for cascades whose lease expired
 
 
 #for registering a new user
 @users_bp.route('/register', methods=['POST'])
+@rate_limited('users')
 def register_user():
     try:
         data = request.json
@@ -34,7 +52,8 @@ def register_user():
         user_data = {
             "username": data["username"],
             "password": hashed_password,
-            "role": data["role"]  # Role can be admin, owner, or tenant
+            "role": data["role"],  # Role can be admin, owner, or tenant
+            "updated_at": datetime.datetime.utcnow()
         }
         users.insert_one(user_data)
 
@@ -78,6 +97,13 @@ def delete_user(user_id):
         if result.deleted_count == 0:
             return make_response(jsonify({"error": "User not found"}), 404)
 
+        sync.record_deletions('users', [user_oid])
+
+        # Invalidates their tokens now, cleans up their reviews in the background.
+        # Uses the normalised id: ObjectId accepts upper-case hex but tokens store lower-case
+        revoke_user_tokens([str(user_oid)])
+        start_cascade([str(user_oid)])
+
         return make_response(jsonify({"message": "User deleted successfully"}), 200)
 
     except Exception as e:
@@ -92,7 +118,7 @@ def update_user_role(user_id):
         data = request.json
         new_role = data.get("role")
 
-        if new_role not in ["admin", "owner", "tenant"]:
+        if new_role not in ROLES:
             return make_response(jsonify({"error": "Invalid role"}), 400)
 
         # Validate ObjectId format
@@ -101,7 +127,7 @@ def update_user_role(user_id):
         except InvalidId:
             return make_response(jsonify({"error": "Invalid user ID format"}), 400)
 
-        result = users.update_one({"_id": user_oid}, {"$set": {"role": new_role}})
+        result = users.update_one({"_id": user_oid}, {"$set": {"role": new_role, "updated_at": datetime.datetime.utcnow()}})
 
         if result.modified_count == 0:
             return make_response(jsonify({"error": "User not found or no changes made"}), 404)
@@ -112,16 +138,260 @@ def update_user_role(user_id):
         return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
 
 
-#Admin get all users
+#Helper function to validate a list of user ids from a request body
+def parse_user_ids(user_ids):
+    if not isinstance(user_ids, list) or not user_ids:
+        raise ValueError("A non-empty list of user ids is required")
+    if len(user_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} users per request")
+
+    try:
+        return [ObjectId(user_id) for user_id in user_ids]
+    except (InvalidId, TypeError):
+        raise ValueError("Invalid user ID format")
+
+
+#Helper function to invalidate every token issued to these users (tokens carry user_id as a string)
+def revoke_user_tokens(user_ids):
+    now = datetime.datetime.utcnow()
+    blacklist.bulk_write([
+        UpdateOne(
+            {"user_id": user_id, "revoked": True},
+            # Tokens live at most TOKEN_LIFETIME, after that the TTL index removes the entry
+            {"$set": {"expire_at": now + globals.TOKEN_LIFETIME, "updated_at": now}},
+            upsert=True
+        )
+        for user_id in user_ids
+    ], ordered=False)
+
+
+#Removes everything that belonged to deleted users, in bounded batches.
+#Every step is idempotent, so a cascade that was interrupted can simply run again
+def cascade_user_deletion(user_ids, job_id=None):
+    # Pull their reviews and recompute average_rating in the same update
+    remove_reviews = [
+        {"$set": {"reviews": {"$filter": {
+            "input": "$reviews",
+            "cond": {"$not": [{"$in": ["$$this.user_id", user_ids]}]}
+        }}}},
+        {"$set": {
+            "average_rating": {"$ifNull": [{"$round": [{"$avg": "$reviews.rating"}, 1]}, 0]},
+            "updated_at": "$$NOW"
+        }}
+    ]
+
+    while True:
+        batch = [property["_id"] for property in
+                 properties.find({"reviews.user_id": {"$in": user_ids}}, {"_id": 1}).limit(CASCADE_BATCH_SIZE)]
+        if not batch:
+            break
+
+        properties.bulk_write([UpdateOne({"_id": property_id}, remove_reviews) for property_id in batch], ordered=False)
+        if job_id is not None:
+            extend_lease(job_id)
+        time.sleep(CASCADE_PAUSE)
+
+    # Their individual logged-out tokens are covered by the user-wide revocation
+    blacklist.delete_many({"user_id": {"$in": user_ids}, "token": {"$exists": True}})
+
+    search_ids = [search["_id"] for search in saved_searches.find({"user_id": {"$in": user_ids}}, {"_id": 1})]
+    sync.record_deletions('saved_searches', search_ids)
+    saved_searches.delete_many({"user_id": {"$in": user_ids}})
+    search_matches.delete_many({"user_id": {"$in": user_ids}})
+
+
+#Records a cascade before it starts, claimed by this process for CASCADE_LEASE
+def record_pending_deletion(user_ids):
+    now = datetime.datetime.utcnow()
+    return pending_deletions.insert_one({
+        "user_ids": user_ids,
+        "created_at": now,
+        "claimed_until": now + CASCADE_LEASE
+    }).inserted_id
+
+
+def extend_lease(job_id):
+    pending_deletions.update_one({"_id": job_id}, {"$set": {"claimed_until": datetime.datetime.utcnow() + CASCADE_LEASE}})
+
+
+#Claims a pending cascade whose lease has expired (its worker died or failed)
+def claim_pending_deletion():
+    now = datetime.datetime.utcnow()
+    return pending_deletions.find_one_and_update(
+        {"claimed_until": {"$lt": now}},
+        {"$set": {"claimed_until": now + CASCADE_LEASE}},
+        sort=[("created_at", 1)]
+    )
+
+
+#Runs one cascade; the pending record is only removed once it has completed
+def run_cascade(job_id, user_ids):
+    try:
+        cascade_user_deletion(user_ids, job_id)
+        pending_deletions.delete_one({"_id": job_id})
+    except Exception as e:
+        # Left in pending_deletions, the next sweep after the lease expires retries it
+        print(f"Error cleaning up deleted users {user_ids}, will retry: {e}")
+
+
+#Runs the given cascade, then any abandoned ones
+def run_pending_cascades(job_id=None, user_ids=None):
+    if job_id is not None:
+        run_cascade(job_id, user_ids)
+
+    try:
+        job = claim_pending_deletion()
+        while job:
+            run_cascade(job["_id"], job["user_ids"])
+            job = claim_pending_deletion()
+    except Exception as e:
+        print(f"Error resuming pending user cleanups: {e}")
+
+
+def start_cascade(user_ids):
+    user_ids = list(user_ids)
+    job_id = record_pending_deletion(user_ids)
+    threading.Thread(target=run_pending_cascades, args=(job_id, user_ids), daemon=True).start()
+
+
+#Periodically retries cascades that failed or whose process died
+def sweep_pending_cascades():
+    while True:
+        run_pending_cascades()
+        time.sleep(CASCADE_SWEEP_INTERVAL)
+
+
+resume_started = False
+
+
+#Starts the sweep once per worker (called on the first request, so it runs after forking)
+def resume_pending_cascades():
+    global resume_started
+    if resume_started:
+        return
+    resume_started = True
+    threading.Thread(target=sweep_pending_cascades, daemon=True).start()
+
+
+#Admin get all users (keyset pagination, filter by role and username prefix).
+#Without a prefix pages are ordered by _id (index role_1__id_1 / _id), with a prefix by
+#(username, _id) so the same index serves the filter and the order
+#(username_1__id_1, or role_1_username_1__id_1 together with role)
 @users_bp.route('/users/all', methods=['GET'])
 @admin_required
 def get_all_users():
     try:
-        users_list = list(users.find({}, {"password": 0}))  # Excludes passwords
+        try:
+            limit = max(1, min(int(request.args.get('limit', 50)), 200))
+        except ValueError:
+            return make_response(jsonify({"error": "limit must be an integer"}), 400)
+
+        query = {}
+
+        if 'role' in request.args:
+            query['role'] = request.args['role']
+
+        by_username = 'username_prefix' in request.args
+        if by_username:
+            # Anchored, case-sensitive prefix regex becomes an index range on username
+            query['username'] = {'$regex': '^' + re.escape(request.args['username_prefix'])}
+
+        if 'after' in request.args:
+            try:
+                after_id = ObjectId(request.args['after'])
+            except InvalidId:
+                return make_response(jsonify({"error": "Invalid cursor"}), 400)
+
+            if by_username:
+                if 'after_username' not in request.args:
+                    return make_response(jsonify({"error": "after_username is required with username_prefix"}), 400)
+                after_username = request.args['after_username']
+                query['$or'] = [
+                    {'username': {'$gt': after_username}},
+                    {'username': after_username, '_id': {'$gt': after_id}}
+                ]
+            else:
+                query['_id'] = {'$gt': after_id}
+
+        sort = [("username", 1), ("_id", 1)] if by_username else [("_id", 1)]
+
+        # Fetch one extra user to know whether another page exists
+        users_list = list(users.find(query, {"password": 0}).sort(sort).limit(limit + 1))
+        has_more = len(users_list) > limit
+        users_list = users_list[:limit]
+
         for user in users_list:
             user["_id"] = str(user["_id"])
 
-        return make_response(jsonify(users_list), 200)
+        response = {
+            "items": users_list,
+            "has_more": has_more,
+            "next_after": users_list[-1]["_id"] if has_more else None
+        }
+        if by_username:
+            response["next_after_username"] = users_list[-1]["username"] if has_more else None
+
+        return make_response(jsonify(response), 200)
+
+    except Exception as e:
+        return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
+
+
+#Admin update the role of many users at once
+@users_bp.route('/users/batch/update-role', methods=['PUT'])
+@admin_required
+def batch_update_user_roles():
+    try:
+        updates = (request.json or {}).get("updates")
+        if not isinstance(updates, list) or not updates:
+            return make_response(jsonify({"error": "A non-empty list of updates is required"}), 400)
+
+        if any(not isinstance(update, dict) or update.get("role") not in ROLES for update in updates):
+            return make_response(jsonify({"error": "Invalid role"}), 400)
+
+        try:
+            user_oids = parse_user_ids([update.get("user_id") for update in updates])
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+
+        now = datetime.datetime.utcnow()
+        result = users.bulk_write([
+            UpdateOne({"_id": user_oid}, {"$set": {"role": update["role"], "updated_at": now}})
+            for user_oid, update in zip(user_oids, updates)
+        ], ordered=False)
+
+        return make_response(jsonify({
+            "message": "User roles updated successfully",
+            "matched": result.matched_count,
+            "modified": result.modified_count
+        }), 200)
+
+    except Exception as e:
+        return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
+
+
+#Admin delete many users at once
+@users_bp.route('/users/batch/delete', methods=['POST'])
+@admin_required
+def batch_delete_users():
+    try:
+        try:
+            user_oids = parse_user_ids((request.json or {}).get("user_ids"))
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+
+        result = users.bulk_write([DeleteOne({"_id": user_oid}) for user_oid in user_oids], ordered=False)
+        sync.record_deletions('users', user_oids)
+
+        # Invalidates their tokens now, cleans up their reviews in the background
+        user_ids = [str(user_oid) for user_oid in user_oids]
+        revoke_user_tokens(user_ids)
+        start_cascade(user_ids)
+
+        return make_response(jsonify({
+            "message": "Users deleted successfully",
+            "deleted": result.deleted_count
+        }), 200)
 
     except Exception as e:
         return make_response(jsonify({"error": "Internal Server Error", "details": str(e)}), 500)
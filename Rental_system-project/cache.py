@@ -0,0 +1,68 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+#Small thread-safe in-process cache with a per-entry time to live and LRU eviction
+class TTLCache:
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return default
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get_or_set(self, key, compute):
+        """Returns the cached value, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Invalidation callbacks per MongoDB collection name. The sync worker calls
+# notify() for every change it sees, so each worker's caches stay coherent
+subscribers = {}
+
+
+def subscribe(collection, callback):
+    """Registers callback(document_id) for changes to collection. document_id is None when everything may have changed."""
+    subscribers.setdefault(collection, []).append(callback)
+
+
+def notify(collection, document_id=None):
+    for callback in subscribers.get(collection, []):
+        try:
+            callback(document_id)
+        except Exception as e:
+            print(f"Error invalidating cache for {collection}: {e}")
+
+
+def notify_all():
+    for collection in list(subscribers):
+        notify(collection)
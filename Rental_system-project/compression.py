@@ -0,0 +1,107 @@
+from flask import request
+from cache import TTLCache
+import hashlib
+import gzip
+import zlib
+import os
+
+try:
+    import brotli  # optional, only gzip is offered when it is not installed
+except ImportError:
+    brotli = None
+
+MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes, smaller bodies are sent as is
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'}
+
+# Public listing endpoints whose compressed bodies are worth keeping
+CACHEABLE_ENDPOINTS = {
+    'properties_bp.get_all_properties',
+    'properties_bp.search_properties',
+    'reviews_bp.get_reviews',
+}
+
+# (sha1 of the body, encoding) -> compressed body. Keyed on the content itself,
+# so a changed listing simply misses and nothing needs invalidating
+compressed_bodies = TTLCache(ttl=600, maxsize=512)
+
+
+def supported_encodings():
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+
+#Picks the encoding from Accept-Encoding, preferring brotli on equal quality
+def negotiate_encoding():
+    return request.accept_encodings.best_match(supported_encodings())
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+#Compresses a streamed response chunk by chunk instead of buffering it
+def compress_stream(chunks, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+#Only anonymous GETs of the listing endpoints share a body between clients
+def is_cacheable():
+    return (request.method == 'GET'
+            and request.endpoint in CACHEABLE_ENDPOINTS
+            and not request.headers.get('x-access-token')
+            and not request.headers.get('Authorization'))
+
+
+def compress_response(response):
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    body = response.get_data()
+    if len(body) < MIN_SIZE:
+        return response
+
+    if is_cacheable():
+        key = (hashlib.sha1(body).hexdigest(), encoding)
+        compressed = compressed_bodies.get_or_set(key, lambda: compress(body, encoding))
+    else:
+        compressed = compress(body, encoding)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -17,6 +17,14 @@ def extract_token():
     return token
 
 
+#HELPER FUNCTION: Checks the blacklist for the token itself or a revocation of all its user's tokens
+def is_revoked(token, data):
+    return blacklist.find_one({'$or': [
+        {'token': token},
+        {'user_id': data.get('user_id'), 'revoked': True}
+    ]}) is not None
+
+
 # JWT authentication decorator
 def jwt_required(func):
     @wraps(func)
@@ -29,7 +37,7 @@ def jwt_required(func):
             data = jwt.decode(token, globals.SECRET_KEY, algorithms=['HS256'])
 
             # Checks if token is blacklisted
-            if blacklist.find_one({'token': token}):
+            if is_revoked(token, data):
                 return make_response(jsonify({'message': 'Token is invalid (blacklisted)'}), 401)
 
             request.user = data  # Stores decoded token data in request object
@@ -61,6 +69,10 @@ def role_required(required_roles):
                 if data.get('role') not in required_roles:
                     return make_response(jsonify({'message': 'Access denied: Insufficient permissions'}), 403)
 
+                # Checks if token is blacklisted (e.g. logged out or the user was deleted)
+                if is_revoked(token, data):
+                    return make_response(jsonify({'message': 'Token is invalid (blacklisted)'}), 401)
+
                 request.user = data  # Store decoded data in request object
 
             except jwt.ExpiredSignatureError:
@@ -1,7 +1,100 @@
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+import datetime
+import threading
+import time
+import os
 
-client = MongoClient("mongodb://localhost:27017")
-db = client.property_rental_db # Database name
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = "property_rental_db" # Database name
 
 SECRET_KEY = 'mysecret'
+TOKEN_LIFETIME = datetime.timedelta(hours=1)
 
+UPLOAD_FOLDER = 'uploads'
+
+INDEX_RETRY_INTERVAL = 30  # seconds between attempts while MongoDB is unreachable
+
+_client = None
+_client_lock = threading.Lock()
+
+
+#Creates the MongoClient on first use instead of at import time
+def get_db():
+    global _client
+    if _client is None:
+        # The sync worker thread and the first request can get here together
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(MONGO_URI)
+
+                # Indexes are built in the background so no request waits for them
+                threading.Thread(target=build_indexes, args=(_client[DB_NAME],),
+                                 name='index-builder', daemon=True).start()
+    return _client[DB_NAME]
+
+
+#Collection handle that only touches the client when it is actually used
+class LazyCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+
+#Lets the blueprints keep using `globals.db.<collection>` at module level
+class LazyDatabase:
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return LazyCollection(name)
+
+
+db = LazyDatabase()
+
+
+#Ensure the upload folder exists (called from the init hook or on first upload)
+def ensure_upload_folder():
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    return UPLOAD_FOLDER
+
+
+#Indexes the queries in the blueprints rely on (create_index is a no-op when they already exist)
+def ensure_indexes(db):
+    db.properties.create_index('owner_id')
+    db.properties.create_index('reviews.user_id')
+    db.users.create_index([('username', 1), ('_id', 1)])
+    db.users.create_index([('role', 1), ('_id', 1)])
+    db.users.create_index([('role', 1), ('username', 1), ('_id', 1)])
+    db.blacklist.create_index('token')
+    db.blacklist.create_index('user_id')
+    db.blacklist.create_index('expire_at', expireAfterSeconds=0)
+    db.saved_searches.create_index('user_id')
+    db.search_matches.create_index([('user_id', 1), ('created_at', -1)])
+    db.search_matches.create_index([('search_id', 1), ('property_id', 1)], unique=True)
+    db.pending_deletions.create_index('claimed_until')
+    db.deletions.create_index('expire_at', expireAfterSeconds=0)
+
+    # Used by the cache sync worker when it has to poll instead of using change streams
+    for collection in ('properties', 'users', 'blacklist', 'saved_searches', 'deletions'):
+        db[collection].create_index('updated_at')
+
+
+#Creates the indexes once per process, retrying while MongoDB is unreachable
+def build_indexes(db):
+    while True:
+        try:
+            ensure_indexes(db)
+            return
+        except PyMongoError as e:
+            print(f"Error creating indexes, retrying in {INDEX_RETRY_INTERVAL}s: {e}")
+            time.sleep(INDEX_RETRY_INTERVAL)
+
+
+#Explicit init hook: connects to MongoDB, creates the indexes before serving and prepares the upload folder
+def init_resources():
+    db = get_db()
+    db.client.admin.command('ping')
+    ensure_indexes(db)
+    ensure_upload_folder()
@@ -0,0 +1,77 @@
+"""Backfills `owner_id` on properties created before it was stored.
+
+Matches the free-text `owner_name` against usernames the same way the old
+delete check did (trimmed, case-insensitive) and writes the user's id in
+batches. Properties whose owner cannot be matched, or whose name matches
+several users that differ only by case, are reported and left untouched.
+
+Usage (from the Rental_system-project folder):
+    python -m jobs.backfill_owner_id [--batch-size 500] [--dry-run]
+"""
+import argparse
+from pymongo import UpdateOne
+import globals
+
+
+#Maps folded usernames to user ids; None marks names shared by several users
+def build_owner_lookup(users):
+    lookup = {}
+    for user in users.find({}, {"username": 1}):
+        name = user["username"].strip().lower()
+        lookup[name] = None if name in lookup else str(user["_id"])
+    return lookup
+
+
+def backfill(batch_size=500, dry_run=False):
+    db = globals.get_db()
+    globals.ensure_indexes(db)  # the owner_id index, before properties are looked up by owner
+
+    owners = build_owner_lookup(db.users)
+    updated, unmatched, ambiguous, batch = 0, [], [], []
+
+    cursor = db.properties.find({"owner_id": {"$exists": False}}, {"owner_name": 1})
+    for property in cursor:
+        name = (property.get("owner_name") or "").strip().lower()
+        if name not in owners:
+            unmatched.append(str(property["_id"]))
+            continue
+
+        owner_id = owners[name]
+        if owner_id is None:  # e.g. "Bob" and "bob" both exist, do not guess
+            ambiguous.append(str(property["_id"]))
+            continue
+
+        batch.append(UpdateOne({"_id": property["_id"], "owner_id": {"$exists": False}},
+                               {"$set": {"owner_id": owner_id}}))
+        if len(batch) >= batch_size:
+            updated += flush(db.properties, batch, dry_run)
+            batch = []
+
+    if batch:
+        updated += flush(db.properties, batch, dry_run)
+
+    return updated, unmatched, ambiguous
+
+
+def flush(collection, batch, dry_run):
+    if dry_run:
+        return len(batch)
+    return collection.bulk_write(batch, ordered=False).modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    updated, unmatched, ambiguous = backfill(args.batch_size, args.dry_run)
+    print(f"{'Would update' if args.dry_run else 'Updated'} {updated} properties")
+    if unmatched:
+        print(f"No matching user for {len(unmatched)} properties: {', '.join(unmatched)}")
+    if ambiguous:
+        print(f"Owner name matches several users (differing only by case) for {len(ambiguous)} properties: {', '.join(ambiguous)}")
+
+
+if __name__ == '__main__':
+    main()
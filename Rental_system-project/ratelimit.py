@@ -0,0 +1,140 @@
+from flask import request, jsonify, make_response
+from functools import wraps
+from collections import namedtuple, OrderedDict
+from decorators import extract_token
+import jwt
+import globals
+import threading
+import time
+import math
+
+# capacity = burst size, refill_rate = tokens added per second
+Policy = namedtuple('Policy', ['capacity', 'refill_rate'])
+
+# Per-blueprint policies
+POLICIES = {
+    'auth': Policy(capacity=5, refill_rate=5 / 60),             # /login
+    'users': Policy(capacity=5, refill_rate=5 / 300),           # /register
+    'properties.search': Policy(capacity=30, refill_rate=1),    # regex scans
+    'properties.view': Policy(capacity=60, refill_rate=2),      # view-increment write
+}
+
+
+#In-process token buckets (one per key), shared by all threads of a worker.
+#Bounded to max_keys with LRU eviction; an evicted bucket simply starts full again
+class MemoryStore:
+    def __init__(self, max_keys=100000):
+        self.buckets = OrderedDict()  # key -> (tokens, last_refill), least recently used first
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, key, policy, now=None):
+        """Takes one token. Returns (allowed, remaining, seconds until the next token)."""
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            tokens, last_refill = self.buckets.get(key, (policy.capacity, now))
+            tokens = min(policy.capacity, tokens + (now - last_refill) * policy.refill_rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+
+            self.buckets[key] = (tokens, now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+
+        reset = 0 if tokens >= 1 else (1 - tokens) / policy.refill_rate
+        return allowed, int(tokens), reset
+
+
+#Shared store for several workers. Works with any client exposing redis-py's `eval`
+#(redis.Redis, or a local stand-in such as fakeredis)
+class RedisStore:
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+
+    def take(self, key, policy, now=None):
+        now = time.time() if now is None else now
+        allowed, tokens = self.client.eval(
+            self.SCRIPT, 1, self.prefix + key, policy.capacity, policy.refill_rate, now
+        )
+        tokens = float(tokens)
+        reset = 0 if tokens >= 1 else (1 - tokens) / policy.refill_rate
+        return bool(allowed), int(tokens), reset
+
+
+store = MemoryStore()
+
+
+#Swaps the backing store (e.g. RedisStore when several workers must share limits)
+def set_store(new_store):
+    global store
+    store = new_store
+
+
+#Uses the JWT user_id when the request carries a valid token, otherwise the client IP.
+#The token is only decoded for keying, the blacklist is not checked here.
+#Behind a proxy, set TRUSTED_PROXIES so remote_addr is the real client (see app.py)
+def client_key():
+    user = getattr(request, 'user', None)
+    if not user:
+        token = extract_token()
+        if token:
+            try:
+                user = jwt.decode(token, globals.SECRET_KEY, algorithms=['HS256'])
+            except jwt.InvalidTokenError:
+                user = None
+
+    if user and user.get('user_id'):
+        return f"user:{user['user_id']}"
+    return f"ip:{request.remote_addr}"
+
+
+def add_rate_limit_headers(response, policy, remaining, reset):
+    response.headers['X-RateLimit-Limit'] = str(policy.capacity)
+    response.headers['X-RateLimit-Remaining'] = str(max(remaining, 0))
+    response.headers['X-RateLimit-Reset'] = str(math.ceil(reset))
+    return response
+
+
+# Rate limiting decorator
+def rate_limited(policy_name):
+    policy = POLICIES[policy_name]
+
+    def decorator(func):
+        @wraps(func)
+        def rate_limited_wrapper(*args, **kwargs):
+            allowed, remaining, reset = store.take(f"{policy_name}:{client_key()}", policy)
+
+            if not allowed:
+                response = make_response(jsonify({'error': 'Too many requests'}), 429)
+                response.headers['Retry-After'] = str(math.ceil(reset))
+                return add_rate_limit_headers(response, policy, remaining, reset)
+
+            response = make_response(func(*args, **kwargs))
+            return add_rate_limit_headers(response, policy, remaining, reset)
+
+        return rate_limited_wrapper
+
+    return decorator
@@ -0,0 +1,175 @@
+from pymongo.errors import OperationFailure, PyMongoError
+import datetime
+import threading
+import os
+import globals
+import cache
+
+WATCHED_COLLECTIONS = ['properties', 'users', 'blacklist', 'saved_searches']
+DELETIONS = 'deletions'  # tombstones of deleted documents, read by the polling fallback
+TOMBSTONE_LIFETIME = datetime.timedelta(hours=1)  # removed by a TTL index after this
+POLL_INTERVAL = float(os.environ.get('SYNC_POLL_INTERVAL', 5))  # seconds, polling fallback only
+CLOCK_SKEW = datetime.timedelta(seconds=2)  # overlap between polls in case worker clocks differ
+
+# Returned by servers that do not support change streams (standalone mongod)
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324}
+
+# The stream cannot continue from the saved resume token (e.g. the oplog has
+# rolled past it), so it has to start again from the current time
+CHANGE_STREAM_NOT_RESUMABLE = {260, 280, 286}  # InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+
+# Fields no cache depends on. Updates touching only these are not invalidations
+# (every GET /properties/<id> increments views)
+IGNORED_FIELDS = {'properties': {'views'}}
+
+
+#Checks whether a change stream event only touched fields no cache depends on
+def is_ignored_update(change):
+    if change.get('operationType') != 'update':
+        return False
+
+    ignored = IGNORED_FIELDS.get(change.get('ns', {}).get('coll'))
+    if not ignored:
+        return False
+
+    description = change.get('updateDescription', {})
+    if description.get('removedFields') or description.get('truncatedArrays'):
+        return False
+
+    updated = {field.split('.')[0] for field in description.get('updatedFields', {})}
+    return bool(updated) and updated <= ignored
+
+
+#Background thread that turns database changes into cache invalidations
+class SyncWorker(threading.Thread):
+    def __init__(self, collections=WATCHED_COLLECTIONS, poll_interval=POLL_INTERVAL):
+        super().__init__(name='cache-sync-worker', daemon=True)
+        self.collections = list(collections)
+        self.poll_interval = poll_interval
+        self.use_change_streams = True
+        self.resume_token = None
+        self.last_seen = {}  # collection -> newest updated_at seen while polling
+        self.recent = {}  # collection -> {(_id, updated_at)} already notified inside the overlap window
+        self.counts = {}  # collection -> document count at the last poll
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                if self.use_change_streams:
+                    self.tail_change_streams()
+                else:
+                    self.poll_once()
+                    self.stopped.wait(self.poll_interval)
+
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED or 'replica set' in str(e):
+                    print("Change streams are not available, polling updated_at instead")
+                    self.use_change_streams = False
+                else:
+                    if e.code in CHANGE_STREAM_NOT_RESUMABLE or e.has_error_label('NonResumableChangeStreamError'):
+                        self.resume_token = None
+                    self.recover(e)
+
+            except PyMongoError as e:
+                self.recover(e)
+
+    def stop(self):
+        self.stopped.set()
+
+    def recover(self, error):
+        """Events may have been missed while disconnected, so drop everything and retry."""
+        print(f"Cache sync worker error: {error}")
+        cache.notify_all()
+        self.stopped.wait(self.poll_interval)
+
+    def tail_change_streams(self):
+        pipeline = [{'$match': {'ns.coll': {'$in': self.collections}}}]
+
+        with globals.get_db().watch(pipeline, resume_after=self.resume_token, max_await_time_ms=1000) as stream:
+            while not self.stopped.is_set():
+                change = stream.try_next()
+                self.resume_token = stream.resume_token
+                if change is None:
+                    continue
+
+                if change['operationType'] == 'invalidate':  # database dropped or renamed
+                    self.resume_token = None
+                    cache.notify_all()
+                    return
+
+                if is_ignored_update(change):
+                    continue
+
+                collection = change.get('ns', {}).get('coll')
+                document_id = change.get('documentKey', {}).get('_id')
+                cache.notify(collection, document_id)
+
+    def poll_changes(self, name, projection):
+        """Returns the documents of name written since the last poll, each version once."""
+        collection = globals.get_db()[name]
+        since = self.last_seen.setdefault(name, datetime.datetime.utcnow())
+        recent = self.recent.setdefault(name, set())
+
+        # The window overlaps the previous poll, so skip versions already notified
+        changed = []
+        for document in collection.find({'updated_at': {'$gt': since - CLOCK_SKEW}}, projection).sort('updated_at', 1):
+            version = (document['_id'], document['updated_at'])
+            if version in recent:
+                continue
+
+            recent.add(version)
+            self.last_seen[name] = max(self.last_seen[name], document['updated_at'])
+            changed.append(document)
+
+        # Forget versions that have left the next poll's window
+        window_start = self.last_seen[name] - CLOCK_SKEW
+        self.recent[name] = {version for version in recent if version[1] > window_start}
+        return changed
+
+    def poll_once(self):
+        db = globals.get_db()
+
+        for name in self.collections:
+            for document in self.poll_changes(name, {'updated_at': 1}):
+                cache.notify(name, document['_id'])
+
+            # Backstop for deletes that left no tombstone (e.g. TTL expiry): treat
+            # any change in the collection size as "everything may have changed"
+            count = db[name].estimated_document_count()
+            if name in self.counts and count != self.counts[name]:
+                cache.notify(name)
+            self.counts[name] = count
+
+        for tombstone in self.poll_changes(DELETIONS, {'collection': 1, 'document_id': 1, 'updated_at': 1}):
+            if tombstone['collection'] in self.collections:
+                cache.notify(tombstone['collection'], tombstone['document_id'])
+
+#Leaves a tombstone for each deleted document. Deletes leave no updated_at behind,
+#so this is how workers on the polling fallback find out about them
+def record_deletions(collection, document_ids):
+    if not document_ids:
+        return
+
+    now = datetime.datetime.utcnow()
+    globals.get_db()[DELETIONS].insert_many([
+        {'collection': collection, 'document_id': document_id, 'updated_at': now,
+         'expire_at': now + TOMBSTONE_LIFETIME}
+        for document_id in document_ids
+    ])
+
+
+worker = None
+worker_lock = threading.Lock()
+
+
+#Starts the sync worker once per process (called on the first request, so it runs after forking)
+def start():
+    global worker
+    if worker is not None:
+        return
+
+    with worker_lock:
+        if worker is None:
+            worker = SyncWorker()
+            worker.start()
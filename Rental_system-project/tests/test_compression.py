@@ -0,0 +1,104 @@
+from flask import Flask, Response
+from cache import TTLCache
+import gzip
+import json
+import pytest
+import compression
+
+BIG = {'items': [{'id': i, 'location_name': 'North Leeds'} for i in range(200)]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(compression, 'compressed_bodies', TTLCache(ttl=600))
+    monkeypatch.setattr(compression, 'CACHEABLE_ENDPOINTS', {'listing'})
+
+    app = Flask(__name__)
+    compression.init_app(app)
+
+    @app.route('/listing')
+    def listing():
+        return BIG
+
+    @app.route('/small')
+    def small():
+        return {'ok': True}
+
+    @app.route('/stream')
+    def stream():
+        return Response((f"line {i}\n" for i in range(500)), mimetype='text/plain')
+
+    return app.test_client()
+
+
+def decompress(response):
+    encoding = response.headers.get('Content-Encoding')
+    if encoding == 'br':
+        return compression.brotli.decompress(response.get_data())
+    if encoding == 'gzip':
+        return gzip.decompress(response.get_data())
+    return response.get_data()
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip', 'gzip'),
+    ('gzip;q=0, deflate', None),
+    ('identity', None),
+    ('', None),
+])
+def test_gzip_negotiation(client, monkeypatch, accept, expected):
+    monkeypatch.setattr(compression, 'brotli', None)
+    response = client.get('/listing', headers={'Accept-Encoding': accept})
+
+    assert response.headers.get('Content-Encoding') == expected
+    assert json.loads(decompress(response)) == BIG
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip, br', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+])
+def test_brotli_negotiation(client, accept, expected):
+    pytest.importorskip('brotli')
+    response = client.get('/listing', headers={'Accept-Encoding': accept})
+
+    assert response.headers['Content-Encoding'] == expected
+
+
+def test_compressed_body_round_trips(client):
+    response = client.get('/listing', headers={'Accept-Encoding': 'gzip'})
+
+    assert gzip.decompress(response.get_data()) == client.get('/listing').get_data()
+    assert response.headers['Content-Length'] == str(len(response.get_data()))
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_small_bodies_are_sent_as_is(client):
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+
+    assert len(response.get_data()) < compression.MIN_SIZE
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_streamed_responses_are_compressed_chunk_by_chunk(client):
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.get_data()).decode() == ''.join(f"line {i}\n" for i in range(500))
+
+
+def test_anonymous_listing_bodies_are_cached(client):
+    client.get('/listing', headers={'Accept-Encoding': 'gzip'})
+
+    assert len(compression.compressed_bodies.entries) == 1
+
+
+@pytest.mark.parametrize('auth_header', ['x-access-token', 'Authorization'])
+def test_authenticated_requests_skip_the_body_cache(client, auth_header):
+    response = client.get('/listing', headers={'Accept-Encoding': 'gzip', auth_header: 'token'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(compression.compressed_bodies.entries) == 0
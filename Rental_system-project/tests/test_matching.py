@@ -0,0 +1,128 @@
+import pytest
+from blueprints.searches.matching import SearchIndex, parse_search_params, validate_search_params
+
+
+def listing(price=500, bedrooms=2, bathrooms=1, location='North Leeds', status='available'):
+    return {
+        'rental_price': price,
+        'bedrooms': bedrooms,
+        'bathrooms': bathrooms,
+        'availability_status': status,
+        'location': {'name': location},
+    }
+
+
+def matched_ids(index, property):
+    return sorted(search_id for search_id, _ in index.match(property))
+
+
+def test_match_uses_price_and_room_filters():
+    index = SearchIndex()
+    index.add('cheap', 'u1', {'min_price': 0, 'max_price': 400})
+    index.add('mid', 'u2', {'min_price': 450, 'max_price': 900, 'bedrooms': 2})
+    index.add('three_beds', 'u3', {'bedrooms': 3})
+    index.add('any', 'u4', {'availability_status': 'available'})
+
+    assert matched_ids(index, listing()) == ['any', 'mid']
+    assert matched_ids(index, listing(price=300, bedrooms=3)) == ['any', 'cheap', 'three_beds']
+
+
+def test_wide_price_range_matches_on_coarse_levels():
+    index = SearchIndex()
+    index.add('wide', 'u1', {'min_price': 0, 'max_price': 10 ** 9})
+
+    assert matched_ids(index, listing(price=123456)) == ['wide']
+
+
+def test_location_is_a_case_insensitive_pattern():
+    index = SearchIndex()
+    index.add('leeds', 'u1', {'location': 'leeds'})
+
+    assert matched_ids(index, listing()) == ['leeds']
+    assert matched_ids(index, listing(location='York')) == []
+
+
+def test_remove_drops_search_and_empty_buckets():
+    index = SearchIndex()
+    index.add('s1', 'u1', {'min_price': 100, 'max_price': 600, 'bedrooms': 2})
+    index.remove('s1')
+
+    assert index.match(listing()) == []
+    assert index.groups == {}
+
+
+def test_re_adding_a_search_replaces_it():
+    index = SearchIndex()
+    index.add('s1', 'u1', {'bedrooms': 2})
+    index.add('s1', 'u1', {'bedrooms': 3})
+
+    assert matched_ids(index, listing(bedrooms=2)) == []
+    assert matched_ids(index, listing(bedrooms=3)) == ['s1']
+
+
+@pytest.mark.parametrize('data', [
+    {'min_price': 'nan', 'max_price': 'nan'},
+    {'min_price': '-inf', 'max_price': 'inf'},
+    {'min_price': 900, 'max_price': 100},
+    {'location': ['x']},
+    {'location': '(unclosed'},
+])
+def test_invalid_saved_searches_are_rejected(data):
+    with pytest.raises(ValueError):
+        validate_search_params(parse_search_params(data))
+
+
+def test_bad_search_does_not_break_other_matches():
+    index = SearchIndex()
+    index.add('good', 'u1', {'bedrooms': 2})
+    index.add('bad', 'u2', {'location': ['x']})  # stored before validation existed
+
+    assert matched_ids(index, listing()) == ['good']
+
+
+def test_rebuild_skips_rows_the_index_cannot_hold(monkeypatch):
+    import blueprints.searches.matching as matching
+
+    class FakeSavedSearches:
+        def find(self, query, projection):
+            return [
+                {'_id': 'nan', 'user_id': 'u1', 'params': {'min_price': float('nan'), 'max_price': float('nan')}},
+                {'_id': 'good', 'user_id': 'u2', 'params': {'bedrooms': 2}},
+            ]
+
+    monkeypatch.setattr(matching, 'saved_searches', FakeSavedSearches())
+    index = SearchIndex()
+    index.rebuild()
+
+    assert index.loaded
+    assert matched_ids(index, listing()) == ['good']
+
+
+def test_record_matches_skips_searches_deleted_elsewhere(monkeypatch):
+    import blueprints.searches.matching as matching
+
+    class FakeSavedSearches:
+        def find(self, query, projection):
+            return [{'_id': 'kept'}] if 'kept' in query['_id']['$in'] else []
+
+    class FakeSearchMatches:
+        def __init__(self):
+            self.upserts = []
+
+        def bulk_write(self, requests, ordered):
+            self.upserts.extend(request._filter['search_id'] for request in requests)
+
+    index = SearchIndex()
+    index.loaded = True
+    index.add('kept', 'u1', {'bedrooms': 2})
+    index.add('deleted', 'u2', {'bedrooms': 2})  # deleted by another worker, not yet synced here
+
+    feed = FakeSearchMatches()
+    monkeypatch.setattr(matching, 'search_index', index)
+    monkeypatch.setattr(matching, 'saved_searches', FakeSavedSearches())
+    monkeypatch.setattr(matching, 'search_matches', feed)
+
+    matching.record_matches(dict(listing(), _id='p1'))
+
+    assert feed.upserts == ['kept']
+    assert 'deleted' not in index.searches
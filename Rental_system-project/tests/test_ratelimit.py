@@ -0,0 +1,85 @@
+from flask import Flask
+import fakeredis
+import pytest
+import ratelimit
+from ratelimit import MemoryStore, RedisStore, Policy
+
+POLICY = Policy(capacity=2, refill_rate=1)
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def store(request):
+    if request.param == 'memory':
+        return MemoryStore()
+    return RedisStore(fakeredis.FakeRedis())
+
+
+def test_bucket_allows_burst_then_refills(store):
+    assert store.take('k', POLICY, now=100)[0]
+    assert store.take('k', POLICY, now=100)[0]
+
+    allowed, remaining, reset = store.take('k', POLICY, now=100)
+    assert not allowed and remaining == 0 and reset == pytest.approx(1)
+
+    assert store.take('k', POLICY, now=101)[0]  # one token refilled after a second
+
+
+def test_keys_have_separate_buckets(store):
+    for _ in range(2):
+        store.take('a', POLICY, now=100)
+
+    assert not store.take('a', POLICY, now=100)[0]
+    assert store.take('b', POLICY, now=100)[0]
+
+
+def test_memory_store_evicts_least_recently_used_keys():
+    store = MemoryStore(max_keys=3)
+    for key in 'abcdefghij':
+        store.take(key, POLICY, now=100)
+    store.take('h', POLICY, now=100)  # recently used, kept over i and j
+    store.take('k', POLICY, now=100)
+
+    assert list(store.buckets) == ['j', 'h', 'k']
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'store', MemoryStore())
+    monkeypatch.setitem(ratelimit.POLICIES, 'test', POLICY)
+
+    app = Flask(__name__)
+
+    @app.route('/limited')
+    @ratelimit.rate_limited('test')
+    def limited():
+        return {'ok': True}
+
+    return app.test_client()
+
+
+def test_responses_carry_rate_limit_headers(client):
+    response = client.get('/limited')
+
+    assert response.status_code == 200
+    assert response.headers['X-RateLimit-Limit'] == '2'
+    assert response.headers['X-RateLimit-Remaining'] == '1'
+    assert response.headers['X-RateLimit-Reset'] == '0'
+
+
+def test_exhausted_bucket_returns_429_with_retry_after(client):
+    client.get('/limited')
+    client.get('/limited')
+    response = client.get('/limited')
+
+    assert response.status_code == 429
+    assert response.json == {'error': 'Too many requests'}
+    assert response.headers['Retry-After'] == '1'
+    assert response.headers['X-RateLimit-Remaining'] == '0'
+
+
+def test_clients_are_limited_by_ip(client):
+    client.get('/limited')
+    client.get('/limited')
+
+    other = client.get('/limited', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 200
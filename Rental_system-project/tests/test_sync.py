@@ -0,0 +1,124 @@
+from pymongo.errors import OperationFailure
+import datetime
+import pytest
+import cache
+import globals
+import sync
+
+
+class FakeCursor(list):
+    def sort(self, field, direction):
+        return FakeCursor(sorted(self, key=lambda document: document[field]))
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    def find(self, query, projection=None):
+        since = query['updated_at']['$gt']
+        return FakeCursor(document for document in self.documents if document['updated_at'] > since)
+
+    def insert_many(self, documents):
+        for document in documents:
+            self.documents.append(dict(document, _id=len(self.documents)))
+
+    def estimated_document_count(self):
+        return len(self.documents)
+
+
+@pytest.fixture
+def notifications(monkeypatch):
+    seen = []
+    monkeypatch.setattr(cache, 'subscribers', {'properties': [seen.append]})
+    return seen
+
+
+@pytest.fixture
+def database(monkeypatch):
+    collections = {'properties': FakeCollection(), 'deletions': FakeCollection()}
+    monkeypatch.setattr(globals, 'get_db', lambda: collections)
+    return collections
+
+
+@pytest.fixture
+def properties(database):
+    return database['properties']
+
+
+def test_poll_notifies_each_write_once(properties, notifications):
+    worker = sync.SyncWorker(collections=['properties'])
+    worker.poll_once()
+
+    properties.documents.append({'_id': 1, 'updated_at': datetime.datetime.utcnow()})
+    for _ in range(5):
+        worker.poll_once()
+
+    # one notification for the write, one for the collection size change
+    assert notifications == [1, None]
+
+
+def test_poll_notifies_again_when_document_is_rewritten(properties, notifications):
+    worker = sync.SyncWorker(collections=['properties'])
+    worker.poll_once()
+
+    now = datetime.datetime.utcnow()
+    properties.documents.append({'_id': 1, 'updated_at': now})
+    worker.poll_once()
+    properties.documents[0]['updated_at'] = now + datetime.timedelta(milliseconds=1)
+    worker.poll_once()
+
+    assert notifications.count(1) == 2
+
+
+def test_poll_sees_delete_cancelled_out_by_insert(database, notifications):
+    worker = sync.SyncWorker(collections=['properties'])
+    database['properties'].documents.append({'_id': 1, 'updated_at': datetime.datetime.utcnow()})
+    worker.poll_once()
+    notifications.clear()
+
+    # Same interval: document 1 deleted, document 2 inserted, the count does not change
+    database['properties'].documents = [{'_id': 2, 'updated_at': datetime.datetime.utcnow()}]
+    sync.record_deletions('properties', [1])
+    worker.poll_once()
+
+    assert sorted(notifications) == [1, 2]
+
+
+def update_event(fields, collection='properties'):
+    return {
+        'operationType': 'update',
+        'ns': {'coll': collection},
+        'documentKey': {'_id': 1},
+        'updateDescription': {'updatedFields': dict.fromkeys(fields, 1), 'removedFields': []},
+    }
+
+
+def test_view_count_updates_are_ignored():
+    assert sync.is_ignored_update(update_event(['views']))
+
+
+def test_updates_touching_other_fields_are_not_ignored():
+    assert not sync.is_ignored_update(update_event(['views', 'rental_price']))
+    assert not sync.is_ignored_update(update_event(['views'], collection='users'))
+    assert not sync.is_ignored_update({'operationType': 'delete', 'ns': {'coll': 'properties'}})
+
+
+class FailingDatabase:
+    def __init__(self, error):
+        self.error = error
+
+    def watch(self, pipeline, resume_after=None, max_await_time_ms=None):
+        raise self.error
+
+
+@pytest.mark.parametrize('code, keeps_token', [(286, False), (260, False), (6, True)])
+def test_resume_token_dropped_when_stream_cannot_resume(monkeypatch, code, keeps_token):
+    worker = sync.SyncWorker(collections=['properties'], poll_interval=0)
+    worker.resume_token = {'_data': 'old'}
+    monkeypatch.setattr(globals, 'get_db', lambda: FailingDatabase(OperationFailure('failed', code=code)))
+    monkeypatch.setattr(worker, 'recover', lambda error: worker.stop())
+
+    worker.run()
+
+    assert (worker.resume_token is not None) == keeps_token
@@ -0,0 +1,86 @@
+import pytest
+from blueprints.users import users
+
+
+class FakePendingDeletions:
+    def __init__(self, jobs=()):
+        self.jobs = list(jobs)
+        self.deleted = []
+
+    def delete_one(self, query):
+        self.deleted.append(query['_id'])
+        self.jobs = [job for job in self.jobs if job['_id'] != query['_id']]
+
+    def find_one_and_update(self, query, update, sort=None):
+        return self.jobs.pop(0) if self.jobs else None
+
+    def update_one(self, query, update):
+        pass
+
+
+@pytest.fixture
+def pending(monkeypatch):
+    collection = FakePendingDeletions()
+    monkeypatch.setattr(users, 'pending_deletions', collection)
+    return collection
+
+
+def test_pending_record_removed_after_cascade_completes(pending, monkeypatch):
+    monkeypatch.setattr(users, 'cascade_user_deletion', lambda user_ids, job_id=None: None)
+
+    users.run_cascade('job1', ['u1'])
+
+    assert pending.deleted == ['job1']
+
+
+def test_pending_record_kept_when_cascade_fails(pending, monkeypatch):
+    def fail(user_ids, job_id=None):
+        raise RuntimeError('connection lost')
+
+    monkeypatch.setattr(users, 'cascade_user_deletion', fail)
+
+    users.run_cascade('job1', ['u1'])
+
+    assert pending.deleted == []
+
+
+def test_abandoned_cascades_are_resumed(pending, monkeypatch):
+    done = []
+    monkeypatch.setattr(users, 'cascade_user_deletion', lambda user_ids, job_id=None: done.append(user_ids))
+    pending.jobs = [{'_id': 'old1', 'user_ids': ['u1']}, {'_id': 'old2', 'user_ids': ['u2']}]
+
+    users.run_pending_cascades()
+
+    assert done == [['u1'], ['u2']]
+    assert pending.deleted == ['old1', 'old2']
+
+
+def test_sweep_retries_failed_cascade(pending, monkeypatch):
+    attempts = []
+
+    def flaky(user_ids, job_id=None):
+        attempts.append(user_ids)
+        if len(attempts) == 1:
+            raise RuntimeError('connection lost')
+
+    class StopSweep(Exception):
+        pass
+
+    sweeps = []
+
+    def sleep(seconds):
+        sweeps.append(seconds)
+        if len(sweeps) == 1:
+            pending.jobs.append({'_id': 'job1', 'user_ids': ['u1']})  # its lease has expired by the next sweep
+        else:
+            raise StopSweep
+
+    monkeypatch.setattr(users, 'cascade_user_deletion', flaky)
+    monkeypatch.setattr(users.time, 'sleep', sleep)
+    pending.jobs = [{'_id': 'job1', 'user_ids': ['u1']}]
+
+    with pytest.raises(StopSweep):
+        users.sweep_pending_cascades()
+
+    assert attempts == [['u1'], ['u1']]
+    assert pending.deleted == ['job1']